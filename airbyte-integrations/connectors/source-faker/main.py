@@ -5,8 +5,8 @@
 
 import sys
 
-from airbyte_cdk.entrypoint import launch
 from source_faker import SourceFaker
+from source_faker.entrypoint import launch
 
 if __name__ == "__main__":
     source = SourceFaker()
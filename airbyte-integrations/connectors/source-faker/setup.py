@@ -5,7 +5,7 @@
 
 from setuptools import find_packages, setup
 
-MAIN_REQUIREMENTS = ["airbyte-cdk~=0.2", "mimesis==6.1.1"]
+MAIN_REQUIREMENTS = ["airbyte-cdk~=0.2", "mimesis==6.1.1", "orjson~=3.8"]
 
 TEST_REQUIREMENTS = [
     "pytest~=6.2",
@@ -2,7 +2,19 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
-from airbyte_cdk.models import AirbyteMessage
+from functools import lru_cache
+from typing import Any, Mapping
+
+import orjson
+from airbyte_cdk.models import AirbyteMessage, AirbyteRecordMessage, Type
+
+
+@lru_cache(maxsize=None)
+def record_json_prefix(stream_name: str) -> bytes:
+    """
+    Everything in the JSON of a stream's RECORD messages which comes before the record's data; it is the same for every record of the stream
+    """
+    return b'{"type":"RECORD","record":{"stream":' + orjson.dumps(stream_name) + b',"data":'
 
 
 class AirbyteMessageWithCachedJSON(AirbyteMessage):
@@ -10,12 +22,30 @@ class AirbyteMessageWithCachedJSON(AirbyteMessage):
     I a monkeypatch to AirbyteMessage which pre-renders the JSON-representation of the object upon initialization.
     This allows the JSON to be calculated in the process that builds the object rather than the main process.
 
+    The JSON is rendered with orjson rather than pydantic's json(), which goes through the much slower stdlib json encoder.
+
     Note: We can't use @cache here because the LRU cache is not serializable when passed to child workers.
     """
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._json = self.json(exclude_unset=True)
+        self._cache_json(orjson.dumps(self.dict(exclude_unset=True)))
+
+    @classmethod
+    def from_record(cls, stream_name: str, data: Mapping[str, Any], emitted_at: int) -> "AirbyteMessageWithCachedJSON":
+        """
+        Builds a RECORD message with pydantic's construct(), skipping field validation and coercion.
+        This is only safe because the records we generate are already of the right types, and saves validating every field of every record.
+
+        Only the record's data is serialized per record, the rest of the message's JSON comes from a per-stream template.
+        """
+        record = AirbyteRecordMessage.construct(stream=stream_name, data=data, emitted_at=emitted_at)
+        message = cls.construct(type=Type.RECORD, record=record)
+        message._cache_json(record_json_prefix(stream_name) + orjson.dumps(data) + b',"emitted_at":%d}}' % emitted_at)
+        return message
+
+    def _cache_json(self, json: bytes):
+        self._json = json.decode()
         self.json = self.get_json
 
     def get_json(self, **kwargs):
@@ -0,0 +1,68 @@
+#
+# Copyright (c) 2023 Airbyte, Inc., all rights reserved.
+#
+
+import logging
+import sys
+from typing import List
+
+from airbyte_cdk.entrypoint import AirbyteEntrypoint
+from airbyte_cdk.sources import Source
+
+# records are rendered by AirbyteMessageWithCachedJSON without spaces, and by pydantic with them
+RECORD_PREFIXES = ('{"type":"RECORD"', '{"type": "RECORD"')
+
+
+def write_messages(messages: List[str]):
+    sys.stdout.write("\n".join(messages) + "\n")
+    sys.stdout.flush()
+
+
+class MessageBatcher:
+    """
+    Holds back records so they can be written to stdout together, and writes them out (in order) as soon as anything else needs to be:
+    * any other message, so that STATE and TRACE messages are never held up behind a batch of records
+    * a log line, which the CDK loggers print straight to stdout rather than yielding it from the entrypoint
+    * a full batch of `batch_size` records
+    Nothing is written on a timer, so the last records of a slice wait for one of these (or for the end of the sync) while the next slice is
+    being generated.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.batch: List[str] = []
+
+    def append(self, message: str):
+        self.batch.append(message)
+        if not message.startswith(RECORD_PREFIXES) or len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            write_messages(self.batch)
+            self.batch = []
+
+    def flush_before_log(self, record: logging.LogRecord) -> bool:
+        self.flush()
+        return True
+
+
+def launch(source: Source, args: List[str], batch_size: int = 1024):
+    """
+    A version of airbyte_cdk.entrypoint.launch which writes records to stdout in batches (see MessageBatcher), rather than with a print() per
+    message. Whatever is left in the batch is written out even if the sync fails, so no messages are lost before the error is.
+    """
+    source_entrypoint = AirbyteEntrypoint(source)
+    parsed_args = source_entrypoint.parse_args(args)
+    batcher = MessageBatcher(batch_size)
+    # the CDK logs through the handlers it sets on the root logger when the entrypoint is created
+    handlers = list(logging.getLogger().handlers)
+    for handler in handlers:
+        handler.addFilter(batcher.flush_before_log)
+    try:
+        for message in source_entrypoint.run(parsed_args):
+            batcher.append(message)
+    finally:
+        batcher.flush()
+        for handler in handlers:
+            handler.removeFilter(batcher.flush_before_log)
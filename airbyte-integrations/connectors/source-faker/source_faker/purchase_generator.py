@@ -2,21 +2,23 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
-import datetime
-from multiprocessing import current_process
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional, Tuple
 
-from airbyte_cdk.models import AirbyteRecordMessage, Type
-from mimesis import Datetime, Numeric
+from mimesis import Numeric
 
 from .airbyte_message_with_cached_json import AirbyteMessageWithCachedJSON
-from .utils import format_airbyte_time, now_millis
+from .utils import SECONDS_PER_DAY, format_airbyte_time, random_unix_time
+
+# (purchase_count, id_offset) for each possible last digit of a user_id, so that every 10 user_ids produce 10 purchases
+PURCHASE_PLANS: Tuple[Tuple[int, int], ...] = ((1, 0), (1, 0), (1, 0), (1, 0), (1, 0), (1, 0), (0, 0), (1, 1), (2, 1), (1, 0))
 
 
 class PurchaseGenerator:
-    def __init__(self, stream_name: str, seed: int) -> None:
+    def __init__(self, stream_name: str, seed: int, total_products: int) -> None:
         self.stream_name = stream_name
         self.seed = seed
+        self.total_products = total_products
 
     def prepare(self):
         """
@@ -24,78 +26,72 @@ class PurchaseGenerator:
         Yes, they *should* be able to be instance variables on this class, which should only instantiated once-per-worker, but that's not quite the case:
         * relying only on prepare as a pool initializer fails because we are calling the parent process's method, not the fork
         * Calling prepare() as part of generate() (perhaps checking if self.person is set) and then `print(self, current_process()._identity, current_process().pid)` reveals multiple object IDs in the same process, resetting the internal random counters
-        """
 
-        seed_with_offset = self.seed
-        if self.seed is not None and len(current_process()._identity) > 0:
-            seed_with_offset = self.seed + current_process()._identity[0]
+        When a seed is set, generate() also reseeds the generator for every user_id, so that a seed always produces the same records, no matter
+        which worker (or how many of them) generated each one.  The key is salted with the stream name so that purchases don't replay the draws
+        the users stream made for the same user_id.
+        """
 
-        global dt
         global numeric
 
-        dt = Datetime(seed=seed_with_offset)
-        numeric = Numeric(seed=seed_with_offset)
+        numeric = Numeric(seed=self.seed)
 
-    def random_date_in_range(
-        self, start_date: datetime.datetime, end_date: datetime.datetime = datetime.datetime.now()
-    ) -> datetime.datetime:
-        time_between_dates = end_date - start_date
-        days_between_dates = time_between_dates.days
-        if days_between_dates < 2:
-            days_between_dates = 2
+    def random_date_in_range(self, start_date: int, end_date: Optional[int] = None) -> int:
+        """
+        Dates are UTC unix seconds; returns `start_date` moved forward by a random number of whole days, without going past `end_date` (now by default)
+        """
+        if end_date is None:
+            end_date = int(time.time())
+        days_between_dates = (end_date - start_date) // SECONDS_PER_DAY
+        if days_between_dates < 1:
+            return start_date
         random_number_of_days = numeric.integer_number(0, days_between_dates)
-        random_date = start_date + datetime.timedelta(days=random_number_of_days)
-        return random_date
+        return start_date + random_number_of_days * SECONDS_PER_DAY
 
-    def generate(self, user_id: int) -> List[Dict]:
+    def generate(self, user_id: int, emitted_at: int) -> List[Dict]:
         """
         Because we are doing this work in parallel processes, we need a deterministic way to know what a purchase's ID should be given on the input of a user_id.
         tldr; Every 10 user_ids produce 10 purchases.  User ID x5 has no purchases, User ID mod x7 has 2, and everyone else has 1
+
+        `emitted_at` is computed once per slice by the caller, rather than reading the clock for every record.
         """
 
+        if self.seed is not None:
+            numeric.reseed(f"{self.seed}:purchases:numeric:{user_id}")
+
         purchases: List[Dict] = []
-        last_user_id_digit = int(repr(user_id)[-1])
-        purchase_count = 1
-        id_offset = 0
-        if last_user_id_digit - 1 == 5:
-            purchase_count = 0
-        elif last_user_id_digit - 1 == 6:
-            id_offset = 1
-        elif last_user_id_digit - 1 == 7:
-            id_offset = 1
-            purchase_count = 2
-
-        total_products = 100
+        purchase_count, id_offset = PURCHASE_PLANS[user_id % 10]
+
+        total_products = self.total_products
         i = 0
 
+        # numeric.integer_number() goes through randint/randrange in pure python, while random() is a single C call on the same seeded
+        # generator, so we use it for the product id and the purchase/return odds
+        random = numeric.random.random
+
         while purchase_count > 0:
-            id = user_id + i + 1 - id_offset
-            time_a = dt.datetime()
-            time_b = dt.datetime()
+            purchase_id = user_id + i + 1 - id_offset
+            time_a = random_unix_time(numeric.random)
+            time_b = random_unix_time(numeric.random)
             created_at = time_a if time_a <= time_b else time_b
-            product_id = numeric.integer_number(1, total_products)
+            product_id = int(random() * total_products) + 1
             added_to_cart_at = self.random_date_in_range(created_at)
-            purchased_at = (
-                self.random_date_in_range(added_to_cart_at)
-                if added_to_cart_at is not None and numeric.integer_number(1, 100) <= 70
-                else None
-            )  # 70% likely to purchase the item in the cart
+            # 70% likely to purchase the item in the cart
+            purchased_at = self.random_date_in_range(added_to_cart_at) if random() < 0.70 else None
             returned_at = (
-                self.random_date_in_range(purchased_at) if purchased_at is not None and numeric.integer_number(1, 100) <= 15 else None
+                self.random_date_in_range(purchased_at) if purchased_at is not None and random() < 0.15 else None
             )  # 15% likely to return the item
 
             purchase = {
-                "id": id,
+                "id": purchase_id,
                 "product_id": product_id,
                 "user_id": user_id + 1,
-                "added_to_cart_at": format_airbyte_time(added_to_cart_at) if added_to_cart_at is not None else None,
+                "added_to_cart_at": format_airbyte_time(added_to_cart_at),
                 "purchased_at": format_airbyte_time(purchased_at) if purchased_at is not None else None,
                 "returned_at": format_airbyte_time(returned_at) if returned_at is not None else None,
             }
 
-            record = AirbyteRecordMessage(stream=self.stream_name, data=purchase, emitted_at=now_millis())
-            message = AirbyteMessageWithCachedJSON(type=Type.RECORD, record=record)
-            purchases.append(message)
+            purchases.append(AirbyteMessageWithCachedJSON.from_record(self.stream_name, purchase, emitted_at))
 
             purchase_count = purchase_count - 1
             i += 1
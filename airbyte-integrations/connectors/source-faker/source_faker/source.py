@@ -2,16 +2,20 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
-from typing import Any, List, Mapping, Tuple
+from typing import Any, Iterator, List, Mapping, MutableMapping, Tuple, Union
 
 from airbyte_cdk.logger import AirbyteLogger
+from airbyte_cdk.models import AirbyteMessage, AirbyteStateMessage, ConfiguredAirbyteCatalog
 from airbyte_cdk.sources import AbstractSource
+from airbyte_cdk.sources.connector_state_manager import ConnectorStateManager
 from airbyte_cdk.sources.streams import Stream
 
 from .streams import Products, Purchases, Users
 
 
 class SourceFaker(AbstractSource):
+    delta_state: bool = False
+
     def check_connection(self, logger: AirbyteLogger, config: Mapping[str, Any]) -> Tuple[bool, Any]:
         if type(config["count"]) == int or type(config["count"]) == float:
             return True, None
@@ -19,14 +23,36 @@ class SourceFaker(AbstractSource):
             return False, "Count option is missing"
 
     def streams(self, config: Mapping[str, Any]) -> List[Stream]:
-        count: int = config["count"] if "count" in config else 0
-        seed: int = config["seed"] if "seed" in config else None
-        records_per_sync: int = config["records_per_sync"] if "records_per_sync" in config else 500
-        records_per_slice: int = config["records_per_slice"] if "records_per_slice" in config else 100
-        parallelism: int = config["parallelism"] if "parallelism" in config else 4
+        count: int = config.get("count", 0)
+        seed: int = config.get("seed")
+        records_per_sync: int = config.get("records_per_sync", 500)
+        records_per_slice: int = config.get("records_per_slice", 100)
+        parallelism: int = config.get("parallelism", 4)
+        checkpoint_interval: int = config.get("checkpoint_interval", 1000)
 
         return [
-            Products(count, seed, parallelism, records_per_sync, records_per_slice),
-            Users(count, seed, parallelism, records_per_sync, records_per_slice),
-            Purchases(count, seed, parallelism, records_per_sync, records_per_slice),
+            Products(count, seed, parallelism, records_per_sync, records_per_slice, checkpoint_interval),
+            Users(count, seed, parallelism, records_per_sync, records_per_slice, checkpoint_interval),
+            Purchases(count, seed, parallelism, records_per_sync, records_per_slice, checkpoint_interval),
         ]
+
+    def read(
+        self,
+        logger: AirbyteLogger,
+        config: Mapping[str, Any],
+        catalog: ConfiguredAirbyteCatalog,
+        state: Union[List[AirbyteStateMessage], MutableMapping[str, Any]] = None,
+    ) -> Iterator[AirbyteMessage]:
+        self.delta_state = config.get("delta_state", False)
+        yield from super().read(logger, config, catalog, state)
+
+    def _checkpoint_state(self, stream: Stream, stream_state, state_manager: ConnectorStateManager) -> AirbyteMessage:
+        """
+        By default, every state message carries the combined legacy state of all the streams in the sync, which grows with the number of streams.
+        When `delta_state` is enabled, the legacy state only contains the stream being checkpointed.
+        Note: only enable this when the destination reads per-stream state, as the legacy state of the other streams will be missing.
+        """
+        message = super()._checkpoint_state(stream, stream_state, state_manager)
+        if self.delta_state:
+            message.state.data = {stream.name: stream.state}
+        return message
@@ -2,30 +2,35 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
-import os
+import math
+from functools import partial
 from multiprocessing import Pool
-from typing import Any, Dict, Iterable, List, Mapping, Optional
+from typing import Any, Iterable, Mapping, Optional
 
 from airbyte_cdk.sources.streams import IncrementalMixin, Stream
 
+from .airbyte_message_with_cached_json import AirbyteMessageWithCachedJSON
 from .purchase_generator import PurchaseGenerator
 from .user_generator import UserGenerator
-from .utils import generate_estimate, read_json
+from .utils import generate_estimate, load_products, load_schema, now_millis
 
 
 class Products(Stream, IncrementalMixin):
     primary_key = None
     cursor_field = "id"
 
-    def __init__(self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, **kwargs):
+    def __init__(
+        self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, checkpoint_interval: int, **kwargs
+    ):
         super().__init__(**kwargs)
         self.seed = seed
         self.records_per_sync = records_per_sync
         self.records_per_slice = records_per_slice
+        self.checkpoint_interval = checkpoint_interval
 
     @property
     def state_checkpoint_interval(self) -> Optional[int]:
-        return self.records_per_slice
+        return self.checkpoint_interval
 
     @property
     def state(self) -> Mapping[str, Any]:
@@ -38,22 +43,24 @@ class Products(Stream, IncrementalMixin):
     def state(self, value: Mapping[str, Any]):
         self._state = value
 
-    def load_products(self) -> List[Dict]:
-        dirname = os.path.dirname(os.path.realpath(__file__))
-        return read_json(os.path.join(dirname, "record_data", "products.json"))
+    def get_json_schema(self) -> Mapping[str, Any]:
+        return load_schema(self.name)
 
     def read_records(self, **kwargs) -> Iterable[Mapping[str, Any]]:
-        total_records = self.state[self.cursor_field] if self.cursor_field in self.state else 0
-        products = self.load_products()
+        total_records = self.state.get(self.cursor_field, 0)
+        products = load_products()
 
         median_record_byte_size = 180
         rows_to_emit = len(products) - total_records
         if rows_to_emit > 0:
             yield generate_estimate(self.name, rows_to_emit, median_record_byte_size)
 
+        # the catalog is cached and shared with every other reader, so each message gets its own shallow copy of the product; nothing in a
+        # product is nested, so whoever consumes the message can modify the record without changing the cache
+        emitted_at = now_millis()
         for product in products:
             if product["id"] > total_records:
-                yield product
+                yield AirbyteMessageWithCachedJSON.from_record(self.name, dict(product), emitted_at)
                 total_records = product["id"]
 
         self.state = {self.cursor_field: total_records, "seed": self.seed}
@@ -63,18 +70,21 @@ class Users(Stream, IncrementalMixin):
     primary_key = None
     cursor_field = "id"
 
-    def __init__(self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, **kwargs):
+    def __init__(
+        self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, checkpoint_interval: int, **kwargs
+    ):
         super().__init__(**kwargs)
         self.count = count
         self.seed = seed
         self.records_per_sync = records_per_sync
         self.records_per_slice = records_per_slice
+        self.checkpoint_interval = checkpoint_interval
         self.parallelism = parallelism
         self.generator = UserGenerator(self.name, self.seed)
 
     @property
     def state_checkpoint_interval(self) -> Optional[int]:
-        return self.records_per_slice
+        return self.checkpoint_interval
 
     @property
     def state(self) -> Mapping[str, Any]:
@@ -87,13 +97,16 @@ class Users(Stream, IncrementalMixin):
     def state(self, value: Mapping[str, Any]):
         self._state = value
 
+    def get_json_schema(self) -> Mapping[str, Any]:
+        return load_schema(self.name)
+
     def read_records(self, **kwargs) -> Iterable[Mapping[str, Any]]:
         """
         This is a multi-process implementation of read_records.
         We make N workers (where N is the number of available CPUs) and spread out the CPU-bound work of generating records and serializing them to JSON
         """
 
-        total_records = self.state[self.cursor_field] if self.cursor_field in self.state else 0
+        total_records = self.state.get(self.cursor_field, 0)
         records_in_sync = 0
 
         median_record_byte_size = 450
@@ -101,19 +114,23 @@ class Users(Stream, IncrementalMixin):
 
         with Pool(initializer=self.generator.prepare, processes=self.parallelism) as pool:
             while records_in_sync < self.count and records_in_sync < self.records_per_sync:
-                records_remaining_this_loop = min(self.records_per_slice, (self.count - total_records))
+                # never generate more users than this sync will emit, so each slice can be yielded as a whole
+                records_remaining_this_loop = min(
+                    self.records_per_slice, (self.count - total_records), (self.records_per_sync - records_in_sync)
+                )
                 if records_remaining_this_loop <= 0:
                     break
-                users = pool.map(self.generator.generate, range(total_records, total_records + records_remaining_this_loop))
-                for user in users:
-                    total_records += 1
-                    records_in_sync += 1
-                    yield user
-
-                    if records_in_sync >= self.records_per_sync:
-                        break
-
+                generate = partial(self.generator.generate, emitted_at=now_millis())
+                # hand each worker one contiguous block of users per slice, rather than many small tasks
+                chunksize = math.ceil(records_remaining_this_loop / self.parallelism)
+                users = pool.map(generate, range(total_records, total_records + records_remaining_this_loop), chunksize)
+                total_records += len(users)
+                records_in_sync += len(users)
+                # the CDK checkpoints right after yielding a record, before this generator resumes, so the state has to cover the whole slice
+                # by the time its last user is yielded; a checkpoint in the middle of a slice still gets the (safe) state of the slice before
+                yield from users[:-1]
                 self.state = {self.cursor_field: total_records, "seed": self.seed}
+                yield from users[-1:]
 
         self.state = {self.cursor_field: total_records, "seed": self.seed}
 
@@ -122,18 +139,21 @@ class Purchases(Stream, IncrementalMixin):
     primary_key = None
     cursor_field = "id"
 
-    def __init__(self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, **kwargs):
+    def __init__(
+        self, count: int, seed: int, parallelism: int, records_per_sync: int, records_per_slice: int, checkpoint_interval: int, **kwargs
+    ):
         super().__init__(**kwargs)
         self.count = count
         self.seed = seed
         self.records_per_sync = records_per_sync
         self.records_per_slice = records_per_slice
+        self.checkpoint_interval = checkpoint_interval
         self.parallelism = parallelism
-        self.generator = PurchaseGenerator(self.name, self.seed)
+        self.generator = PurchaseGenerator(self.name, self.seed, len(load_products()))
 
     @property
     def state_checkpoint_interval(self) -> Optional[int]:
-        return self.records_per_slice
+        return self.checkpoint_interval
 
     @property
     def state(self) -> Mapping[str, Any]:
@@ -146,14 +166,18 @@ class Purchases(Stream, IncrementalMixin):
     def state(self, value: Mapping[str, Any]):
         self._state = value
 
+    def get_json_schema(self) -> Mapping[str, Any]:
+        return load_schema(self.name)
+
     def read_records(self, **kwargs) -> Iterable[Mapping[str, Any]]:
         """
         This is a multi-process implementation of read_records.
         We make N workers (where N is the number of available CPUs) and spread out the CPU-bound work of generating records and serializing them to JSON
         """
 
-        total_purchase_records = self.state[self.cursor_field] if self.cursor_field in self.state else 0
-        total_user_records = self.state["user_id"] if "user_id" in self.state else 0
+        state = self.state
+        total_purchase_records = state.get(self.cursor_field, 0)
+        total_user_records = state.get("user_id", 0)
         user_records_in_sync = 0
 
         # a fuzzy guess, some users have purchases, some don't
@@ -162,21 +186,21 @@ class Purchases(Stream, IncrementalMixin):
 
         with Pool(initializer=self.generator.prepare, processes=self.parallelism) as pool:
             while total_user_records < self.count and user_records_in_sync < self.records_per_sync:
-                records_remaining_this_loop = min(self.records_per_slice, (self.count - user_records_in_sync))
+                records_remaining_this_loop = min(
+                    self.records_per_slice, (self.count - total_user_records), (self.records_per_sync - user_records_in_sync)
+                )
                 if records_remaining_this_loop <= 0:
                     break
-                carts = pool.map(self.generator.generate, range(total_user_records, total_user_records + records_remaining_this_loop))
-                for purchases in carts:
-                    for purchase in purchases:
-                        total_purchase_records += 1
-                        yield purchase
-
-                    total_user_records += 1
-                    user_records_in_sync += 1
-
-                    if user_records_in_sync >= self.records_per_sync:
-                        break
-
+                generate = partial(self.generator.generate, emitted_at=now_millis())
+                chunksize = math.ceil(records_remaining_this_loop / self.parallelism)
+                carts = pool.map(generate, range(total_user_records, total_user_records + records_remaining_this_loop), chunksize)
+                purchases = [purchase for cart in carts for purchase in cart]
+                total_purchase_records += len(purchases)
+                total_user_records += len(carts)
+                user_records_in_sync += len(carts)
+                # as with users, the state has to cover the whole slice by the time its last purchase is yielded (a slice may have none)
+                yield from purchases[:-1]
                 self.state = {self.cursor_field: total_purchase_records, "user_id": total_user_records, "seed": self.seed}
+                yield from purchases[-1:]
 
         self.state = {self.cursor_field: total_purchase_records, "user_id": total_user_records, "seed": self.seed}
@@ -2,14 +2,12 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
-from multiprocessing import current_process
-
-from airbyte_cdk.models import AirbyteRecordMessage, Type
-from mimesis import Datetime, Person
+from mimesis import Numeric, Person
+from mimesis.data import EMAIL_DOMAINS
 from mimesis.locales import Locale
 
 from .airbyte_message_with_cached_json import AirbyteMessageWithCachedJSON
-from .utils import format_airbyte_time, now_millis
+from .utils import format_airbyte_time, random_unix_time
 
 
 class UserGenerator:
@@ -23,30 +21,40 @@ class UserGenerator:
         Yes, they *should* be able to be instance variables on this class, which should only instantiated once-per-worker, but that's not quite the case:
         * relying only on prepare as a pool initializer fails because we are calling the parent process's method, not the fork
         * Calling prepare() as part of generate() (perhaps checking if self.person is set) and then `print(self, current_process()._identity, current_process().pid)` reveals multiple object IDs in the same process, resetting the internal random counters
-        """
 
-        seed_with_offset = self.seed
-        if self.seed is not None and len(current_process()._identity) > 0:
-            seed_with_offset = self.seed + current_process()._identity[0]
+        When a seed is set, generate() also reseeds the generators for every user_id, so that a seed always produces the same records, no matter
+        which worker (or how many of them) generated each one.  Each provider gets its own key made of the seed, the stream, the provider and the
+        user_id, so the providers don't replay each other's draws and neighbouring seeds don't produce the same users shifted by one id.
+        """
 
         global person
-        global dt
+        global numeric
 
-        person = Person(locale=Locale.EN, seed=seed_with_offset)
-        dt = Datetime(seed=seed_with_offset)
+        person = Person(locale=Locale.EN, seed=self.seed)
+        numeric = Numeric(seed=self.seed)
 
-    def generate(self, user_id: int):
-        time_a = dt.datetime()
-        time_b = dt.datetime()
+    def generate(self, user_id: int, emitted_at: int):
+        if self.seed is not None:
+            person.reseed(f"{self.seed}:users:person:{user_id}")
+            numeric.reseed(f"{self.seed}:users:numeric:{user_id}")
+
+        random = numeric.random
+        time_a = random_unix_time(random)
+        time_b = random_unix_time(random)
+        if time_a <= time_b:
+            created_at, updated_at = time_a, time_b
+        else:
+            created_at, updated_at = time_b, time_a
 
         # faker doesn't always produce unique email addresses, so to enforce uniqueness, we will append the user_id to the prefix
-        email_parts = person.email().split("@")
-        email = f"{email_parts[0]}+{user_id + 1}@{email_parts[1]}"
+        # this makes the same draws as person.email(), in the same order, so we don't need to render the address and split it apart again
+        domain = person.random.choice(EMAIL_DOMAINS)
+        email = f"{person.username(mask='ld')}+{user_id + 1}{domain}"
 
         profile = {
             "id": user_id + 1,
-            "created_at": format_airbyte_time(time_a if time_a <= time_b else time_b),
-            "updated_at": format_airbyte_time(time_a if time_a > time_b else time_b),
+            "created_at": format_airbyte_time(created_at),
+            "updated_at": format_airbyte_time(updated_at),
             "name": person.name(),
             "title": person.title(),
             "age": person.age(),
@@ -62,11 +70,4 @@ class UserGenerator:
             "weight": person.weight(),
         }
 
-        while not profile["created_at"]:
-            profile["created_at"] = format_airbyte_time(dt.datetime())
-
-        if not profile["updated_at"]:
-            profile["updated_at"] = profile["created_at"] + 1
-
-        record = AirbyteRecordMessage(stream=self.stream_name, data=profile, emitted_at=now_millis())
-        return AirbyteMessageWithCachedJSON(type=Type.RECORD, record=record)
+        return AirbyteMessageWithCachedJSON.from_record(self.stream_name, profile, emitted_at)
@@ -3,30 +3,65 @@
 #
 
 import datetime
-import json
+import os
+import time
+from functools import lru_cache
+from random import Random
+from typing import Any, Dict, List, Mapping
 
+import orjson
 from airbyte_cdk.models import AirbyteEstimateTraceMessage, AirbyteTraceMessage, EstimateType, TraceType
+from airbyte_cdk.sources.utils.schema_helpers import ResourceSchemaLoader
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# the same range as mimesis' Datetime().datetime(): from the start of 2000 until the end of the current year, in UTC unix seconds
+MIN_UNIX_TIME = int(datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+MAX_UNIX_TIME = int(datetime.datetime(datetime.date.today().year + 1, 1, 1, tzinfo=datetime.timezone.utc).timestamp()) - 1
 
 
 def read_json(filepath):
-    with open(filepath, "r") as f:
-        return json.loads(f.read())
+    with open(filepath, "rb") as f:
+        return orjson.loads(f.read())
+
+
+@lru_cache(maxsize=None)
+def load_products() -> List[Dict]:
+    """
+    The products catalog is static, so we only read it from disk once per process.
+    Note: the returned list is shared between callers and must not be mutated.
+    """
+    dirname = os.path.dirname(os.path.realpath(__file__))
+    return read_json(os.path.join(dirname, "record_data", "products.json"))
+
+
+@lru_cache(maxsize=None)
+def load_schema(stream_name: str) -> Mapping[str, Any]:
+    """
+    Discover asks every stream for its schema, and the streams are rebuilt for every call to SourceFaker.streams(), so we only load and
+    resolve each schema file once per process.
+    """
+    return ResourceSchemaLoader("source_faker").get_schema(stream_name)
+
+
+def random_unix_time(random: Random) -> int:
+    return MIN_UNIX_TIME + int(random.random() * (MAX_UNIX_TIME - MIN_UNIX_TIME))
 
 
-def format_airbyte_time(d: datetime):
-    s = f"{d}"
-    s = s.split(".")[0]
-    s = s.replace(" ", "T")
-    s += "+00:00"
-    return s
+def format_airbyte_time(unix_time: int) -> str:
+    """
+    Renders UTC unix seconds as an ISO 8601 timestamp, e.g. 2021-01-01T00:00:00+00:00
+    Timestamps are generated as ints and only turned into strings here, so we never build datetime or timedelta objects per record.
+    """
+    return time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(unix_time))
 
 
-def now_millis():
-    return int(datetime.datetime.now().timestamp() * 1000)
+def now_millis() -> int:
+    return int(time.time() * 1000)
 
 
 def generate_estimate(stream_name: str, total: int, bytes_per_row: int):
-    emitted_at = int(datetime.datetime.now().timestamp() * 1000)
+    emitted_at = now_millis()
     estimate_message = AirbyteEstimateTraceMessage(
         type=EstimateType.STREAM, name=stream_name, row_estimate=round(total), byte_estimate=round(total * bytes_per_row)
     )
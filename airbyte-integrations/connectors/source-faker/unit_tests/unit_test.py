@@ -2,10 +2,17 @@
 # Copyright (c) 2023 Airbyte, Inc., all rights reserved.
 #
 
+import json
+import logging
+
 import jsonschema
 import pytest
-from airbyte_cdk.models import AirbyteMessage, ConfiguredAirbyteCatalog, Type
+from airbyte_cdk.models import AirbyteMessage, AirbyteRecordMessage, ConfiguredAirbyteCatalog, Type
 from source_faker import SourceFaker
+from source_faker.airbyte_message_with_cached_json import AirbyteMessageWithCachedJSON
+from source_faker.entrypoint import MessageBatcher, launch
+from source_faker.purchase_generator import PurchaseGenerator
+from source_faker.utils import SECONDS_PER_DAY, load_products
 
 
 class MockLogger:
@@ -131,7 +138,7 @@ def test_no_read_limit_hit():
 
 def test_read_big_random_data():
     source = SourceFaker()
-    config = {"count": 1000, "records_per_slice": 100, "records_per_sync": 1000, "parallelism": 1}
+    config = {"count": 1000, "records_per_slice": 100, "records_per_sync": 1000, "checkpoint_interval": 100, "parallelism": 1}
     catalog = ConfiguredAirbyteCatalog(
         streams=[
             {
@@ -166,7 +173,7 @@ def test_read_big_random_data():
 
 def test_with_purchases():
     source = SourceFaker()
-    config = {"count": 1000, "records_per_sync": 1000, "parallelism": 1}
+    config = {"count": 1000, "records_per_sync": 1000, "checkpoint_interval": 100, "parallelism": 1}
     catalog = ConfiguredAirbyteCatalog(
         streams=[
             {
@@ -256,8 +263,8 @@ def test_read_with_seed():
     iterator = source.read(logger, config, catalog, state)
 
     records = [row for row in iterator if row.type is Type.RECORD]
-    assert records[0].record.data["occupation"] == "Cartoonist"
-    assert records[0].record.data["email"] == "reflect1958+1@yahoo.com"
+    assert records[0].record.data["occupation"] == "Plastics Consultant"
+    assert records[0].record.data["email"] == "subaru1810+1@example.com"
 
 
 def test_ensure_no_purchases_without_users():
@@ -272,3 +279,210 @@ def test_ensure_no_purchases_without_users():
         state = {}
         iterator = source.read(logger, config, catalog, state)
         iterator.__next__()
+
+
+def test_checkpoint_interval_is_independent_of_slices():
+    source = SourceFaker()
+    config = {"count": 1500, "records_per_slice": 100, "records_per_sync": 1500, "parallelism": 1}
+    catalog = ConfiguredAirbyteCatalog(
+        streams=[
+            {
+                "stream": {"name": "users", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            }
+        ]
+    )
+    state = {}
+    iterator = source.read(logger, config, catalog, state)
+
+    record_rows_count = 0
+    states = []
+    for row in iterator:
+        if row.type is Type.RECORD:
+            record_rows_count = record_rows_count + 1
+        if row.type is Type.STATE:
+            states.append((record_rows_count, row.state.data))
+
+    assert record_rows_count == 1500
+    # one checkpoint after the default 1000 record interval, which covers exactly the records emitted before it, and the final state
+    assert states == [(1000, {"users": {"id": 1000, "seed": None}}), (1500, {"users": {"id": 1500, "seed": None}})]
+
+
+def test_delta_state():
+    source = SourceFaker()
+    config = {"count": 10, "parallelism": 1, "delta_state": True}
+    catalog = ConfiguredAirbyteCatalog(
+        streams=[
+            {
+                "stream": {"name": "users", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            },
+            {
+                "stream": {"name": "products", "json_schema": {}, "supported_sync_modes": ["full_refresh"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            },
+        ]
+    )
+    state = {}
+    iterator = source.read(logger, config, catalog, state)
+
+    states = [row.state for row in iterator if row.type is Type.STATE]
+
+    assert states[0].data == {"users": {"id": 10, "seed": None}}
+    assert states[-1].data == {"products": {"id": 100, "seed": None}}
+    assert states[-1].stream.stream_descriptor.name == "products"
+
+
+def test_random_date_in_range():
+    generator = PurchaseGenerator("purchases", 100, 100)
+    generator.prepare()
+
+    start_date = 1_600_000_000
+    assert generator.random_date_in_range(start_date, start_date) == start_date
+    assert generator.random_date_in_range(start_date, start_date + SECONDS_PER_DAY - 1) == start_date
+    assert generator.random_date_in_range(start_date, start_date - 10 * SECONDS_PER_DAY) == start_date
+
+    for _ in range(100):
+        random_date = generator.random_date_in_range(start_date, start_date + 10 * SECONDS_PER_DAY)
+        assert start_date <= random_date <= start_date + 10 * SECONDS_PER_DAY
+        assert (random_date - start_date) % SECONDS_PER_DAY == 0
+
+
+def test_cached_json_matches_airbyte_message_json():
+    record = AirbyteRecordMessage(stream="users", data={"id": 1, "blood_type": "B\u2212", "weight": 81}, emitted_at=1680014520152)
+    message = AirbyteMessageWithCachedJSON(type=Type.RECORD, record=record)
+    expected = AirbyteMessage(type=Type.RECORD, record=record)
+
+    assert json.loads(message.json(exclude_unset=True)) == json.loads(expected.json(exclude_unset=True))
+
+    constructed = AirbyteMessageWithCachedJSON.from_record(record.stream, record.data, record.emitted_at)
+    assert constructed.record == record
+    assert json.loads(constructed.json(exclude_unset=True)) == json.loads(expected.json(exclude_unset=True))
+
+
+def test_read_with_seed_does_not_depend_on_parallelism():
+    catalog = ConfiguredAirbyteCatalog(
+        streams=[
+            {
+                "stream": {"name": "users", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            },
+            {
+                "stream": {"name": "purchases", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            },
+        ]
+    )
+
+    def read_records(parallelism: int):
+        source = SourceFaker()
+        config = {"count": 50, "seed": 100, "records_per_slice": 10, "parallelism": parallelism}
+        iterator = source.read(logger, config, catalog, {})
+        return [(row.record.stream, row.record.data) for row in iterator if row.type is Type.RECORD]
+
+    assert read_records(1) == read_records(3)
+
+
+def test_launch_writes_every_message(tmp_path, capsys):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"count": 25, "parallelism": 1}))
+    catalog_path = tmp_path / "catalog.json"
+    catalog_path.write_text(
+        json.dumps(
+            {
+                "streams": [
+                    {
+                        "stream": {"name": "users", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                        "sync_mode": "incremental",
+                        "destination_sync_mode": "overwrite",
+                    }
+                ]
+            }
+        )
+    )
+
+    launch(SourceFaker(), ["read", "--config", str(config_path), "--catalog", str(catalog_path)], batch_size=10)
+
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    records = [message for message in messages if message["type"] == "RECORD"]
+    assert [record["record"]["data"]["id"] for record in records] == list(range(1, 26))
+    assert messages[-1]["type"] == "STATE"
+
+
+def test_purchases_do_not_go_past_count_when_resuming():
+    source = SourceFaker()
+    config = {"count": 100, "records_per_sync": 1000, "parallelism": 1}
+    catalog = ConfiguredAirbyteCatalog(
+        streams=[
+            {
+                "stream": {"name": "purchases", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            }
+        ]
+    )
+    state = {"purchases": {"id": 95, "user_id": 95}}
+    iterator = source.read(logger, config, catalog, state)
+
+    records = []
+    latest_state = {}
+    for row in iterator:
+        if row.type is Type.RECORD:
+            records.append(row.record.data)
+        if row.type is Type.STATE:
+            latest_state = row
+
+    assert records
+    assert max(record["user_id"] for record in records) == 100
+    assert latest_state.state.data["purchases"]["user_id"] == 100
+
+
+def test_products_do_not_share_the_cached_catalog():
+    source = SourceFaker()
+    config = {"count": 1}
+    catalog = ConfiguredAirbyteCatalog(
+        streams=[
+            {
+                "stream": {"name": "products", "json_schema": {}, "supported_sync_modes": ["incremental"]},
+                "sync_mode": "incremental",
+                "destination_sync_mode": "overwrite",
+            }
+        ]
+    )
+    records = [row for row in source.read(logger, config, catalog, {}) if row.type is Type.RECORD]
+
+    assert records[0].record.data == load_products()[0]
+    assert records[0].record.data is not load_products()[0]
+
+
+def test_message_batcher_only_holds_back_records(capsys):
+    batcher = MessageBatcher(batch_size=10)
+    record = AirbyteMessageWithCachedJSON.from_record("users", {"id": 1}, 1680014520152).json()
+    state = AirbyteMessage(type=Type.STATE, state={"data": {"users": {"id": 1}}}).json(exclude_unset=True)
+
+    batcher.append(record)
+    assert capsys.readouterr().out == ""
+
+    batcher.append(state)
+    assert capsys.readouterr().out.splitlines() == [record, state]
+
+    batcher.append(record)
+    assert batcher.flush_before_log(logging.makeLogRecord({"msg": "Read 1 records from users stream"}))
+    assert capsys.readouterr().out.splitlines() == [record]
+
+
+def test_message_batcher_writes_full_batches(capsys):
+    batcher = MessageBatcher(batch_size=3)
+    records = [AirbyteMessageWithCachedJSON.from_record("users", {"id": i}, 1680014520152).json() for i in range(1, 8)]
+
+    for record in records:
+        batcher.append(record)
+    assert capsys.readouterr().out.splitlines() == records[:6]
+
+    batcher.flush()
+    assert capsys.readouterr().out.splitlines() == records[6:]